@@ -0,0 +1,188 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from .config import Config
+
+# A cached response: (revalidation headers, decoded JSON body)
+CacheEntry = Tuple[Dict[str, str], Any]
+
+class CacheBackend(ABC):
+    """Interface for CanvasClient response caches."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache. Fast, but lost on restart and not shared between workers."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+class SqliteCache(CacheBackend):
+    """
+    On-disk cache shared by every server process on the host.
+
+    Uses SQLite in WAL mode so readers do not block the writer, stores values as
+    zlib-compressed JSON, expires entries after ttl_seconds and evicts the least
+    recently used entries once the total stored size passes max_bytes. Queries run
+    in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 86400, max_bytes: int = 100 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # Minimum seconds between accessed_at writes for the same entry
+        self.access_update_interval = 60
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+            # Running total of stored bytes, kept exact by triggers for every process
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM cache"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache"
+                " BEGIN UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache"
+                " BEGIN UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache"
+                " BEGIN UPDATE cache_size SET total = total - OLD.size + NEW.size WHERE id = 0; END"
+            )
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so concurrent processes serialize
+        # their write-then-evict sequences instead of both evicting
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            # LRU order only needs to be approximate, so skip the write on most hits
+            if now - row[2] > self.access_update_interval:
+                self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        stored = json.loads(zlib.decompress(row[0]))
+        return stored["validators"], stored["data"]
+
+    def _set(self, key: str, entry: CacheEntry):
+        value = zlib.compress(json.dumps({"validators": entry[0], "data": entry[1]}).encode("utf-8"))
+        now = time.time()
+        with self._lock, self._transaction():
+            # Upsert (not REPLACE) so the size triggers see an UPDATE for existing keys
+            self._conn.execute(
+                "INSERT INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, value, len(value), now + self.ttl_seconds, now)
+            )
+            if self._total_size() > self.max_bytes:
+                self._prune(now)
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def _prune(self, now: float):
+        """Drop expired, then least recently used entries until under max_bytes (inside a write transaction)."""
+        self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        excess = self._total_size() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall():
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, entry: CacheEntry):
+        await asyncio.to_thread(self._set, key, entry)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+def create_cache_backend() -> CacheBackend:
+    """Build the cache backend selected by CACHE_BACKEND ("memory" or "sqlite")."""
+    backend = (Config.CACHE_BACKEND or "memory").lower()
+    if backend == "memory":
+        return MemoryCache(max_entries=Config.CACHE_MAX_ENTRIES)
+    if backend == "sqlite":
+        return SqliteCache(
+            Config.CACHE_PATH,
+            ttl_seconds=Config.CACHE_TTL_SECONDS,
+            max_bytes=Config.CACHE_MAX_BYTES
+        )
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}' (use memory or sqlite)")
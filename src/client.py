@@ -1,10 +1,31 @@
+import hashlib
+import re
+import time
 import httpx
-from typing import Any, Dict, List, Optional, Union
-from urllib.parse import urlparse, parse_qs
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse, urlunparse, parse_qs
+from .cache import CacheBackend, create_cache_backend
 from .config import Config
+from .tracing import current_timing, span
+
+class PagedList(list):
+    """A paginated result: a plain list plus pagination info (truncated, next_url, ...)."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.info: Dict[str, Any] = {"truncated": False, "next_url": None}
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.info.get("truncated"))
+
+def _span_url(url: str) -> str:
+    """Scheme, host and path of a URL for span attributes; query strings can carry signed tokens."""
+    parsed = urlparse(url)
+    return urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", ""))
 
 class CanvasClient:
-    def __init__(self):
+    def __init__(self, cache_backend: Optional[CacheBackend] = None):
         Config.validate()
         self.base_url = Config.CANVAS_BASE_URL
         self.headers = {
@@ -14,13 +35,55 @@ class CanvasClient:
         }
         self.default_per_page = 50
         self.default_max_pages = 5
+        # Canvas caps per_page at 100 for most endpoints; smaller caps are learned per
+        # endpoint as (cap, learned_at) and forgotten after per_page_cap_ttl seconds
+        self.max_per_page = 100
+        self.endpoint_max_per_page: Dict[str, Tuple[int, float]] = {}
+        self.per_page_cap_ttl = 3600
+        # Consecutive equal short pages needed to infer a cap Canvas did not echo
+        self.short_page_evidence = 3
+        # Running (bytes, records) per endpoint, used to keep auto-sized pages reasonably small
+        self.endpoint_record_stats: Dict[str, List[int]] = {}
+        self.target_page_bytes = 1024 * 1024
+        # Revalidating response cache: key -> (validators, data)
+        self.cache = cache_backend or create_cache_backend()
+        # Keys are scoped to the token so a shared on-disk cache never crosses users
+        self._cache_scope = hashlib.sha256(Config.CANVAS_TOKEN.encode("utf-8")).hexdigest()[:16]
 
-    async def _request(self, method: str, url: str, params: Optional[Dict] = None) -> httpx.Response:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(method, url, headers=self.headers, params=params)
-            response.raise_for_status()
+    async def _request(self, method: str, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> httpx.Response:
+        request_headers = self.headers if not headers else {**self.headers, **headers}
+        with span("canvas.request", phase="canvas_request", method=method, url=_span_url(url)) as otel_span:
+            async with httpx.AsyncClient() as client:
+                response = await client.request(method, url, headers=request_headers, params=params)
+            if otel_span is not None:
+                otel_span.set_attribute("http.status_code", response.status_code)
+            stats = current_timing()
+            if stats is not None:
+                stats.requests += 1
+                stats.bytes += len(response.content)
+            # 304 is a valid answer to a conditional request, not an error
+            if response.status_code != 304:
+                response.raise_for_status()
             return response
 
+    def _cache_key(self, url: str, params: Optional[Dict]) -> str:
+        key = f"{self._cache_scope}:{url}"
+        if not params:
+            return key
+        return key + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+    async def _store_cached(self, key: str, response: httpx.Response, data: Any):
+        validators = {}
+        if response.headers.get("etag"):
+            validators["If-None-Match"] = response.headers["etag"]
+        if response.headers.get("last-modified"):
+            validators["If-Modified-Since"] = response.headers["last-modified"]
+        if not validators:
+            # Nothing to revalidate against, so caching would only serve stale data
+            await self.cache.delete(key)
+            return
+        await self.cache.set(key, (validators, data))
+
     def _parse_next_link(self, link_header: str) -> Optional[str]:
         if not link_header:
             return None
@@ -40,12 +103,12 @@ class CanvasClient:
                 return url_part
         return None
 
-    async def request(self, path: str, method: str = "GET", params: Optional[Dict] = None, paginate: bool = False, max_pages: int = None) -> Union[Dict, List]:
+    def _build_url(self, path: str) -> str:
         if not path.startswith("http"):
-            url = f"{self.base_url}{path}"
-        else:
-            url = path
+            return f"{self.base_url}{path}"
+        return path
 
+    def _process_params(self, params: Optional[Dict]) -> Dict:
         # Handle array parameters for Canvas (e.g., include[] instead of include)
         processed_params = {}
         if params:
@@ -56,35 +119,197 @@ class CanvasClient:
                     processed_params[f"{key}[]"] = value
                 else:
                     processed_params[key] = value
+        return processed_params
 
-        response = await self._request(method, url, params=processed_params)
-        data = response.json()
+    async def request(self, path: str, method: str = "GET", params: Optional[Dict] = None, paginate: bool = False, max_pages: int = None, cache: bool = False, max_items: Optional[int] = None) -> Union[Dict, List]:
+        """
+        Make a Canvas API request.
+
+        With cache=True (GET, non-paginated only) the response is kept in the cache
+        backend (see src/cache.py) and revalidated on the next call with
+        If-None-Match / If-Modified-Since, so an unchanged resource costs a 304
+        instead of a full body.
 
-        if not paginate or not isinstance(data, list):
+        With paginate=True the result is a PagedList; see iter_pages for how
+        per_page, max_pages and max_items are planned.
+        """
+        url = self._build_url(path)
+        processed_params = self._process_params(params)
+
+        use_cache = cache and method == "GET" and not paginate
+        if use_cache:
+            key = self._cache_key(url, processed_params)
+            cached = await self.cache.get(key)
+            response = await self._request(method, url, params=processed_params, headers=cached[0] if cached else None)
+            if response.status_code == 304 and cached:
+                stats = current_timing()
+                if stats is not None:
+                    stats.cache_hits += 1
+                return cached[1]
+            data = response.json()
+            await self._store_cached(key, response, data)
             return data
 
-        results = data
-        max_p = max_pages if max_pages is not None else self.default_max_pages
+        if paginate and method == "GET":
+            results = PagedList()
+            pages = self.iter_pages(path, params=params, max_pages=max_pages, max_items=max_items, info=results.info)
+            async for page in pages:
+                if not isinstance(page, list):
+                    return page
+                results.extend(page)
+                if max_items and len(results) >= max_items:
+                    break
+            await pages.aclose()
+            if max_items and len(results) >= max_items:
+                # The caller got everything it asked for
+                del results[max_items:]
+                results.info.update({"truncated": False, "next_url": None})
+            return results
+
+        response = await self._request(method, url, params=processed_params)
+        return response.json()
+
+    def _count_page(self):
+        stats = current_timing()
+        if stats is not None:
+            stats.pages += 1
+
+    def _endpoint_key(self, path: str) -> str:
+        # Collapse ids so /courses/1/assignments and /courses/2/assignments share stats
+        endpoint = urlparse(self._build_url(path)).path
+        return re.sub(r"/\d+(?=/|$)", "/:id", endpoint)
+
+    def plan_pagination(self, path: str, per_page: Optional[int] = None, max_pages: Optional[int] = None, max_items: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Choose per_page and max_pages for a listing.
+
+        An explicit per_page is always kept as given. Otherwise per_page is sized
+        to max_items when that fits in one page, so nothing is over-fetched, and to
+        the endpoint maximum when it does not, so round trips are minimal; endpoints
+        with large records are capped so a page stays near target_page_bytes.
+        max_pages is the caller's budget; request() stops once max_items is reached.
+        """
+        endpoint = self._endpoint_key(path)
+        limit = self._per_page_limit(endpoint)
+
+        if per_page is None:
+            per_page = limit
+            record_stats = self.endpoint_record_stats.get(endpoint)
+            if record_stats and record_stats[1]:
+                avg_bytes = record_stats[0] / record_stats[1]
+                per_page = min(per_page, max(10, int(self.target_page_bytes // max(avg_bytes, 1))))
+            if max_items:
+                per_page = min(per_page, max_items)
+        else:
+            per_page = max(1, per_page)
+
+        if max_pages is None:
+            max_pages = self.default_max_pages
+        return per_page, max_pages
+
+    def _per_page_limit(self, endpoint: str) -> int:
+        learned = self.endpoint_max_per_page.get(endpoint)
+        if learned is None:
+            return self.max_per_page
+        cap, learned_at = learned
+        if time.monotonic() - learned_at > self.per_page_cap_ttl:
+            # Let the cap recover in case it was wrong or Canvas raised it
+            del self.endpoint_max_per_page[endpoint]
+            return self.max_per_page
+        return cap
+
+    def _learn_page(self, endpoint: str, requested_per_page: int, page: List, size: int, next_link: Optional[str], short_run: List[int]):
+        """
+        Record page statistics and, on firm evidence only, a smaller per_page cap.
+
+        Short pages alone are not evidence: Canvas filters some listings (e.g. the
+        to-do list, visibility-restricted items) after paginating. A cap is learned
+        when Canvas echoes a smaller per_page in the next link, or when
+        short_page_evidence consecutive pages with next links have the same short
+        length. short_run is [length, count] state for the current listing.
+        """
+        if page:
+            record_stats = self.endpoint_record_stats.setdefault(endpoint, [0, 0])
+            record_stats[0] += size
+            record_stats[1] += len(page)
+        if not next_link:
+            return
+
+        echoed = parse_qs(urlparse(next_link).query).get("per_page")
+        if echoed and echoed[0].isdigit() and 0 < int(echoed[0]) < requested_per_page:
+            self.endpoint_max_per_page[endpoint] = (int(echoed[0]), time.monotonic())
+            return
+
+        if 0 < len(page) < requested_per_page:
+            if short_run[0] == len(page):
+                short_run[1] += 1
+            else:
+                short_run[0], short_run[1] = len(page), 1
+            if short_run[1] >= self.short_page_evidence:
+                self.endpoint_max_per_page[endpoint] = (len(page), time.monotonic())
+        else:
+            short_run[0], short_run[1] = 0, 0
+
+    async def iter_pages(self, path: str, params: Optional[Dict] = None, max_pages: int = None, max_items: Optional[int] = None, info: Optional[Dict] = None) -> AsyncIterator[Union[Dict, List]]:
+        """
+        Yield a paginated GET one page at a time, following Link rel="next".
+
+        Callers that can decide early that they have enough (e.g. a date window on a
+        sorted listing) can stop iterating and no further pages are requested.
+        A non-list first response is yielded as-is and ends the iteration.
+
+        per_page is planned from max_items (see plan_pagination) when params has
+        no per_page. If given, `info` is filled with "truncated" and
+        "next_url" so callers can tell when max_pages cut the listing short.
+        """
+        params = dict(params or {})
+        per_page, max_p = self.plan_pagination(path, params.get("per_page"), max_pages, max_items)
+        params["per_page"] = per_page
+        endpoint = self._endpoint_key(path)
+        if info is None:
+            info = {}
+        info.update({"truncated": False, "next_url": None, "per_page": per_page, "max_pages": max_p})
+
+        response = await self._request("GET", self._build_url(path), params=self._process_params(params))
+        data = response.json()
+        self._count_page()
+        if not isinstance(data, list):
+            yield data
+            return
+
         page_count = 1
-        
+        short_run = [0, 0]
         next_link = self._parse_next_link(response.headers.get("link"))
-        
+        self._learn_page(endpoint, per_page, data, len(response.content), next_link, short_run)
+        info["truncated"] = bool(next_link) and page_count >= max_p
+        info["next_url"] = next_link if info["truncated"] else None
+        yield data
+
         while next_link and page_count < max_p:
             # next_link usually contains the full URL with params
             response = await self._request("GET", next_link)
             new_data = response.json()
-            if isinstance(new_data, list):
-                results.extend(new_data)
-            else:
+            if not isinstance(new_data, list):
                 break
-                
+            self._count_page()
             next_link = self._parse_next_link(response.headers.get("link"))
             page_count += 1
-            
-        return results
+            self._learn_page(endpoint, per_page, new_data, len(response.content), next_link, short_run)
+            info["truncated"] = bool(next_link) and page_count >= max_p
+            info["next_url"] = next_link if info["truncated"] else None
+            yield new_data
 
     async def get_file_content(self, url: str) -> bytes:
         """Download file content (binary)."""
+        with span("canvas.download", phase="download", url=_span_url(url)):
+            content = await self._download(url)
+        stats = current_timing()
+        if stats is not None:
+            stats.requests += 1
+            stats.bytes += len(content)
+        return content
+
+    async def _download(self, url: str) -> bytes:
         # Canvas file URLs might require auth, or might be public S3/CDN links.
         # We'll try with auth first.
         try:
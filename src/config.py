@@ -18,3 +18,14 @@ class Config:
 
     # MCP Server Token for Authentication
     MCP_SERVER_TOKEN = os.getenv("MCP_SERVER_TOKEN", "test-token")
+
+    # Optional OpenTelemetry tracing: "console", "file" (appends JSON lines to TRACE_FILE) or unset
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER")
+    TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+    # Response cache: "memory" (per process) or "sqlite" (on disk, shared across processes and restarts)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_PATH = os.getenv("CACHE_PATH", "canvas_cache.sqlite3")
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
@@ -1,9 +1,12 @@
-from fastmcp import FastMCP
-from fastmcp.server.auth.providers.jwt import StaticTokenVerifier
 from .config import Config
-from .tools import courses, content, assignments, social
 
 def create_server():
+    # Imported here so that merely importing this module stays cheap: parse-pool
+    # workers (spawn) re-import the main module, and must not build a client/cache
+    from fastmcp import FastMCP
+    from fastmcp.server.auth.providers.jwt import StaticTokenVerifier
+    from .tools import courses, content, assignments, social
+
     print(f"DEBUG: MCP_SERVER_TOKEN = '{Config.MCP_SERVER_TOKEN}'")
     # Initialize Auth Verifier
     auth = StaticTokenVerifier(tokens={
@@ -23,10 +26,23 @@ def create_server():
     
     return mcp
 
-mcp = create_server()
+_mcp = None
+
+def get_server():
+    """Build the server on first use."""
+    global _mcp
+    if _mcp is None:
+        _mcp = create_server()
+    return _mcp
+
+def __getattr__(name):
+    # Keep `src.server:mcp` working for tools that look up the server object
+    if name == "mcp":
+        return get_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def main():
-    mcp.run(transport="http", host="127.0.0.1", port=2222, stateless_http=True)
+    get_server().run(transport="http", host="127.0.0.1", port=2222, stateless_http=True)
 
 if __name__ == "__main__":
     main()
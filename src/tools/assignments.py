@@ -1,18 +1,36 @@
+from datetime import datetime, timezone
 from typing import List, Optional
 import json
 from fastmcp import FastMCP
 from ..client import client
+from ..tracing import traced_tool
+from ..utils import paged_response, parse_datetime, query_items
+
+def _bucket_for_window(due_after: Optional[str], due_before: Optional[str]) -> Optional[str]:
+    """Pick a Canvas bucket that is a superset of the due-date window, if one exists."""
+    now = datetime.now(timezone.utc)
+    after = parse_datetime(due_after)
+    before = parse_datetime(due_before)
+    if after is not None and after >= now:
+        return "future"
+    if before is not None and before <= now:
+        return "past"
+    return None
 
 def register_tools(mcp: FastMCP):
     # --- Assignments ---
     @mcp.tool()
+    @traced_tool
     async def list_assignments(
         course_id: str,
         search_term: Optional[str] = None,
         bucket: Optional[str] = None,
         order_by: Optional[str] = None,
         include: Optional[List[str]] = None,
-        per_page: int = 50,
+        due_after: Optional[str] = None,
+        due_before: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -22,7 +40,15 @@ def register_tools(mcp: FastMCP):
         Args:
             bucket: Filter by bucket (past, overdue, undated, etc).
             order_by: Order by (position, due_at, name, etc).
+            due_after: ISO8601; only return assignments due at or after this time.
+            due_before: ISO8601; only return assignments due at or before this time.
+            sort_by: Sort results by 'due_at', '-due_at' or 'name'.
         """
+        windowed = bool(due_after or due_before)
+        if windowed:
+            # Let Canvas narrow and order the listing so pagination can stop early
+            bucket = bucket or _bucket_for_window(due_after, due_before)
+            order_by = order_by or "due_at"
         params = {
             "search_term": search_term,
             "bucket": bucket,
@@ -31,19 +57,32 @@ def register_tools(mcp: FastMCP):
             "per_page": per_page
         }
         try:
+            if windowed or sort_by:
+                info = {}
+                data = await query_items(
+                    client.iter_pages(f"/api/v1/courses/{course_id}/assignments", params=params, max_pages=max_pages, info=info),
+                    due_after=due_after,
+                    due_before=due_before,
+                    sort_by=sort_by,
+                    sorted_by_due=order_by == "due_at",
+                    max_items=max_items,
+                    info=info
+                )
+                return json.dumps(paged_response(data, info), indent=2)
+
             data = await client.request(
                 f"/api/v1/courses/{course_id}/assignments",
                 params=params,
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def get_assignment(
         course_id: str,
         assignment_id: str,
@@ -61,10 +100,11 @@ def register_tools(mcp: FastMCP):
 
     # --- Quizzes ---
     @mcp.tool()
+    @traced_tool
     async def list_quizzes(
         course_id: str,
         search_term: Optional[str] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -74,15 +114,15 @@ def register_tools(mcp: FastMCP):
                 f"/api/v1/courses/{course_id}/quizzes",
                 params={"search_term": search_term, "per_page": per_page},
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def get_quiz(course_id: str, quiz_id: str) -> str:
         """Get a single quiz."""
         try:
@@ -1,18 +1,40 @@
+import asyncio
 import json
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from fastmcp import FastMCP
 from ..client import client
-from ..utils import extract_pdf_text
+from ..tracing import traced_tool
+from ..utils import extract_pdf_text, find_extractor, paged_response, run_in_parse_pool
+
+# Concurrent file downloads allowed per read_pdfs call
+MAX_CONCURRENT_DOWNLOADS = 4
+
+def _file_summary(file_id: str, file_meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": file_id,
+        "name": file_meta.get("display_name", file_meta.get("filename", "unknown")),
+        "mime_type": file_meta.get("content-type", file_meta.get("mime_type", "")),
+        "size": file_meta.get("size")
+    }
+
+def _is_pdf(file_meta: Dict[str, Any]) -> bool:
+    summary = _file_summary("", file_meta)
+    return "pdf" in summary["mime_type"].lower() or summary["name"].lower().endswith(".pdf")
+
+def _download_url(file_id: str, file_meta: Dict[str, Any]) -> str:
+    # Construct API download URL if 'url' not present
+    return file_meta.get("url") or f"/api/v1/files/{file_id}/download"
 
 def register_tools(mcp: FastMCP):
     # --- Files ---
     @mcp.tool()
+    @traced_tool
     async def list_files(
         course_id: Optional[str] = None,
         folder_id: Optional[str] = None,
         search_term: Optional[str] = None,
         include: Optional[List[str]] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -35,14 +57,13 @@ def register_tools(mcp: FastMCP):
         }
         
         try:
-            data = await client.request(path, params=params, paginate=True, max_pages=max_pages)
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            data = await client.request(path, params=params, paginate=True, max_pages=max_pages, max_items=max_items)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def get_file(file_id: str, include: Optional[List[str]] = None) -> str:
         """Get metadata for a file."""
         try:
@@ -52,6 +73,7 @@ def register_tools(mcp: FastMCP):
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def read_pdf(file_id: str, max_chars: int = 20000) -> str:
         """Download a PDF file and extract its text."""
         try:
@@ -60,35 +82,24 @@ def register_tools(mcp: FastMCP):
             if not isinstance(file_meta, dict):
                  return json.dumps({"error": f"Could not retrieve file metadata for id {file_id}"})
 
-            name = file_meta.get("display_name", file_meta.get("filename", "unknown"))
-            mime = file_meta.get("content-type", file_meta.get("mime_type", ""))
+            summary = _file_summary(file_id, file_meta)
             
             # Basic validation
-            if "pdf" not in mime.lower() and not name.lower().endswith(".pdf"):
-                return json.dumps({"error": f"File {name} (type {mime}) does not appear to be a PDF."})
+            if not _is_pdf(file_meta):
+                return json.dumps({"error": f"File {summary['name']} (type {summary['mime_type']}) does not appear to be a PDF."})
 
             # 2. Download content
-            download_url = file_meta.get("url")
-            if not download_url:
-                 # Construct API download URL if 'url' not present
-                 download_url = f"/api/v1/files/{file_id}/download"
-            
             # client handles ensuring download param if needed, but usually the 'url' field works
             # We might need to ensure 'download=1' if using the API endpoint directly.
             # But client.get_file_content handles the request.
             
-            buffer = await client.get_file_content(download_url)
+            buffer = await client.get_file_content(_download_url(file_id, file_meta))
             
             # 3. Parse PDF
-            text = extract_pdf_text(buffer, max_chars=max_chars)
+            text = await run_in_parse_pool(extract_pdf_text, buffer, max_chars)
             
             result = {
-                "file": {
-                    "id": file_id,
-                    "name": name,
-                    "mime_type": mime,
-                    "size": file_meta.get("size")
-                },
+                "file": summary,
                 "text": text,
                 "truncated": len(text) == max_chars if max_chars > 0 else False
             }
@@ -97,11 +108,161 @@ def register_tools(mcp: FastMCP):
         except Exception as e:
              return json.dumps({"error": f"Error reading PDF: {str(e)}"})
 
+    @mcp.tool()
+    @traced_tool
+    async def read_file(file_id: str, max_chars: int = 20000) -> str:
+        """
+        Download a file and extract its text.
+
+        Supports PDF, Word (.docx), PowerPoint (.pptx), Excel (.xlsx) and plain
+        text formats such as .txt, .csv and .md.
+        """
+        try:
+            file_meta = await client.request(f"/api/v1/files/{file_id}")
+            if not isinstance(file_meta, dict):
+                return json.dumps({"error": f"Could not retrieve file metadata for id {file_id}"})
+
+            summary = _file_summary(file_id, file_meta)
+            extractor = find_extractor(summary["mime_type"], file_meta.get("filename") or summary["name"])
+            if extractor is None:
+                return json.dumps({"error": f"File {summary['name']} (type {summary['mime_type']}) is not a supported document format."})
+
+            buffer = await client.get_file_content(_download_url(file_id, file_meta))
+            text = await run_in_parse_pool(extractor, buffer, max_chars)
+
+            result = {
+                "file": summary,
+                "text": text,
+                "truncated": len(text) == max_chars if max_chars > 0 else False
+            }
+            return json.dumps(result, indent=2)
+
+        except Exception as e:
+            return json.dumps({"error": f"Error reading file: {str(e)}"})
+
+    @mcp.tool()
+    @traced_tool
+    async def read_pdfs(
+        file_ids: Optional[List[str]] = None,
+        folder_id: Optional[str] = None,
+        course_id: Optional[str] = None,
+        module_id: Optional[str] = None,
+        max_chars_per_file: int = 20000,
+        max_total_chars: int = 60000,
+        max_files: int = 20
+    ) -> str:
+        """
+        Download several PDF files and extract their text in one call.
+
+        Provide `file_ids`, a `folder_id`, or a `course_id` + `module_id` (PDF files in
+        that module). Metadata, downloads and parsing run concurrently. Text is
+        truncated to `max_chars_per_file` per document and `max_total_chars` overall,
+        allotted in input order. Failures are reported per file; ids beyond
+        `max_files` are listed in `skipped_files`.
+        """
+        try:
+            # 1. Resolve the file list; folder listings already carry metadata
+            if not (file_ids or folder_id or module_id):
+                return json.dumps({"error": "Provide file_ids, folder_id, or course_id and module_id"})
+            known_meta: Dict[str, Dict[str, Any]] = {}
+            ids = list(file_ids or [])
+            listing_truncated = False
+            if folder_id:
+                files = await client.request(
+                    f"/api/v1/folders/{folder_id}/files",
+                    params={"per_page": 100},
+                    paginate=True
+                )
+                listing_truncated |= getattr(files, "truncated", False)
+                for f in files:
+                    if _is_pdf(f):
+                        known_meta[str(f["id"])] = f
+                        ids.append(str(f["id"]))
+            if module_id:
+                if not course_id:
+                    return json.dumps({"error": "course_id is required with module_id"})
+                items = await client.request(
+                    f"/api/v1/courses/{course_id}/modules/{module_id}/items",
+                    params={"per_page": 100},
+                    paginate=True
+                )
+                listing_truncated |= getattr(items, "truncated", False)
+                # Item titles are display names and often lack an extension, so
+                # read_one checks the PDF type from each file's metadata
+                ids.extend(str(i["content_id"]) for i in items if i.get("type") == "File")
+            # Preserve order, drop duplicates
+            ids = list(dict.fromkeys(ids))
+            skipped_files = ids[max_files:]
+            ids = ids[:max_files]
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+        download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        # Text length of each finished file, by position in ids
+        finished_chars: Dict[int, int] = {}
+
+        def budget_for(index: int) -> int:
+            """Most text file `index` can still get: earlier files have priority."""
+            if max_total_chars <= 0:
+                return max_chars_per_file
+            remaining = max_total_chars - sum(n for i, n in finished_chars.items() if i < index)
+            if max_chars_per_file > 0:
+                return min(max_chars_per_file, remaining)
+            return remaining
+
+        async def read_one(index: int, file_id: str) -> Dict[str, Any]:
+            try:
+                file_meta = known_meta.get(file_id)
+                if file_meta is None:
+                    file_meta = await client.request(f"/api/v1/files/{file_id}")
+                if not isinstance(file_meta, dict):
+                    return {"file": {"id": file_id}, "error": f"Could not retrieve file metadata for id {file_id}"}
+                summary = _file_summary(file_id, file_meta)
+                if not _is_pdf(file_meta):
+                    return {"file": summary, "error": f"File {summary['name']} (type {summary['mime_type']}) does not appear to be a PDF."}
+
+                skipped = {"file": summary, "text": "", "truncated": True, "skipped": "max_total_chars used up"}
+                if budget_for(index) <= 0 and max_total_chars > 0:
+                    return skipped
+                async with download_slots:
+                    buffer = await client.get_file_content(_download_url(file_id, file_meta))
+                # Earlier files may have finished while this one downloaded
+                budget = budget_for(index)
+                if budget <= 0 and max_total_chars > 0:
+                    return skipped
+                text = await run_in_parse_pool(extract_pdf_text, buffer, budget)
+                finished_chars[index] = len(text)
+                return {"file": summary, "text": text, "truncated": len(text) == budget if budget > 0 else False}
+            except Exception as e:
+                return {"file": {"id": file_id}, "error": f"Error reading PDF: {str(e)}"}
+
+        results = await asyncio.gather(*(read_one(index, file_id) for index, file_id in enumerate(ids)))
+
+        # 2. Apply the shared character budget in input order
+        remaining = max_total_chars
+        for result in results:
+            if "text" not in result or max_total_chars <= 0:
+                continue
+            if len(result["text"]) > remaining:
+                result["text"] = result["text"][:remaining]
+                result["truncated"] = True
+            remaining -= len(result["text"])
+
+        return json.dumps({
+            "files": results,
+            "total_chars": sum(len(r.get("text", "")) for r in results),
+            "errors": sum(1 for r in results if "error" in r),
+            # Files beyond max_files, and whether the folder/module listing itself was cut short
+            "skipped_files": skipped_files,
+            "truncated": bool(skipped_files) or listing_truncated
+        }, indent=2)
+
     # --- Folders ---
     @mcp.tool()
+    @traced_tool
     async def list_folders(
         course_id: str,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -111,15 +272,15 @@ def register_tools(mcp: FastMCP):
                 f"/api/v1/courses/{course_id}/folders", 
                 params={"per_page": per_page}, 
                 paginate=True, 
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def get_folder(folder_id: str) -> str:
         """Get metadata for a folder."""
         try:
@@ -130,10 +291,11 @@ def register_tools(mcp: FastMCP):
 
     # --- Modules ---
     @mcp.tool()
+    @traced_tool
     async def list_modules(
         course_id: str,
         include: Optional[List[str]] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -147,21 +309,21 @@ def register_tools(mcp: FastMCP):
                 f"/api/v1/courses/{course_id}/modules",
                 params={"include": include, "per_page": per_page},
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     # --- Pages ---
     @mcp.tool()
+    @traced_tool
     async def list_pages(
         course_id: str,
         search_term: Optional[str] = None,
         sort: Optional[str] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -176,15 +338,15 @@ def register_tools(mcp: FastMCP):
                 f"/api/v1/courses/{course_id}/pages",
                 params=params,
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def get_page(
         course_id: str,
         page_url: str,
@@ -2,15 +2,18 @@ from typing import List, Optional, Union
 import json
 from fastmcp import FastMCP
 from ..client import client
+from ..tracing import traced_tool
+from ..utils import paged_response
 
 def register_tools(mcp: FastMCP):
     @mcp.tool()
+    @traced_tool
     async def list_courses(
         enrollment_state: Optional[str] = None,
         state: Optional[str] = None,
         search_term: Optional[str] = None,
         include: Optional[List[str]] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -22,8 +25,8 @@ def register_tools(mcp: FastMCP):
             state: Filter by course state (available, completed, etc).
             search_term: Filter by search term.
             include: Array of extra data to include (e.g. ['term', 'teachers']).
-            per_page: Items per page (Canvas max 100).
-            max_pages: Max pages to fetch.
+            per_page: Items per page (Canvas max 100). Chosen from max_items when omitted.
+            max_pages: Max pages to fetch. Results cut short by this limit are marked as truncated.
             max_items: Max items to return.
         """
         params = {
@@ -39,17 +42,15 @@ def register_tools(mcp: FastMCP):
                 "/api/v1/courses", 
                 params=params, 
                 paginate=True, 
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-                
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     @mcp.tool()
+    @traced_tool
     async def get_course(
         course_id: str,
         include: Optional[List[str]] = None
@@ -1,17 +1,147 @@
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+import asyncio
+import heapq
 import json
+import httpx
 from fastmcp import FastMCP
 from ..client import client
+from ..tracing import traced_tool
+from ..utils import due_sort_key, item_due_date, paged_response, query_items
+
+# Canvas answers 503 while it builds a topic's materialized view; retry this often before falling back
+VIEW_RETRY_DELAYS = (1.0, 2.0)
+
+# Open-ended bounds for calendar_events date windows
+CALENDAR_MIN_DATE = "1970-01-01T00:00:00Z"
+CALENDAR_MAX_DATE = "2100-01-01T00:00:00Z"
+
+def _attach_new_entries(view: List[Dict[str, Any]], new_entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge the flat new_entries list into the view tree under each entry's parent.
+
+    The view may come from the response cache, so the tree is copied rather than
+    modified in place. Entries whose parent is missing become top-level entries.
+    """
+    roots = [dict(entry) for entry in view]
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    stack = list(roots)
+    while stack:
+        entry = stack.pop()
+        entry["replies"] = [dict(reply) for reply in entry.get("replies") or []]
+        by_id[entry.get("id")] = entry
+        stack.extend(entry["replies"])
+
+    pending = []
+    for entry in new_entries:
+        if entry.get("id") in by_id:
+            continue
+        copy = dict(entry, replies=list(entry.get("replies") or []))
+        by_id[copy.get("id")] = copy
+        pending.append(copy)
+    for entry in pending:
+        parent = by_id.get(entry.get("parent_id"))
+        if parent is not None and parent is not entry:
+            parent["replies"].append(entry)
+        else:
+            roots.append(entry)
+    return roots
+
+def _iter_thread_entries(
+    entries: List[Dict[str, Any]],
+    participants: Dict[Any, str],
+    max_depth: Optional[int] = None,
+    include_deleted: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Walk a discussion view tree depth-first, yielding flat entries in thread order.
+
+    Uses an explicit stack so very deep reply chains cannot hit the recursion limit.
+    Replies deeper than max_depth are skipped (depth 0 is a top-level entry).
+    """
+    stack = [(entry, 0) for entry in reversed(entries)]
+    while stack:
+        entry, depth = stack.pop()
+        replies = entry.get("replies") or []
+        if max_depth is None or depth < max_depth:
+            stack.extend((reply, depth + 1) for reply in reversed(replies))
+
+        if entry.get("deleted") and not include_deleted:
+            continue
+        yield {
+            "id": entry.get("id"),
+            "parent_id": entry.get("parent_id"),
+            "depth": depth,
+            "user_id": entry.get("user_id"),
+            "user_name": participants.get(entry.get("user_id")),
+            "created_at": entry.get("created_at"),
+            "updated_at": entry.get("updated_at"),
+            "deleted": bool(entry.get("deleted")),
+            "message": entry.get("message"),
+            "reply_count": len(replies)
+        }
+
+async def _fetch_thread_entries(course_id: str, topic_id: str) -> Dict[str, Any]:
+    """
+    Build a /view-shaped response from the paged /entries endpoints.
+
+    Used when the materialized view is not ready. Costs one request per page of
+    top-level entries plus one per entry whose replies were not all inlined.
+    """
+    base = f"/api/v1/courses/{course_id}/discussion_topics/{topic_id}/entries"
+    top_level = await client.request(base, params={"per_page": 100}, paginate=True, max_pages=20)
+    replies: List[Dict[str, Any]] = []
+    slots = asyncio.Semaphore(4)
+
+    async def fetch_replies(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not entry.get("has_more_replies"):
+            return list(entry.get("recent_replies") or [])
+        async with slots:
+            return await client.request(
+                f"{base}/{entry['id']}/replies", params={"per_page": 100}, paginate=True, max_pages=20
+            )
+
+    for batch in await asyncio.gather(*(fetch_replies(entry) for entry in top_level)):
+        replies.extend(batch)
+
+    view = [{k: v for k, v in entry.items() if k not in ("recent_replies", "replies")} for entry in top_level]
+    participants = {}
+    for entry in view + replies:
+        if entry.get("user_id") is not None:
+            participants[entry["user_id"]] = entry.get("user_name")
+    return {
+        "view": view,
+        "new_entries": replies,
+        "participants": [{"id": user_id, "display_name": name} for user_id, name in participants.items()],
+        "unread_entries": []
+    }
+
+def _deadline_entry(item: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """Normalize a to-do item or calendar event into a common deadline shape."""
+    assignment = item.get("assignment") or {}
+    target = assignment or item.get("quiz") or {}
+    due = item_due_date(item)
+    return {
+        "source": source,
+        "type": item.get("type"),
+        "title": target.get("name") or target.get("title") or item.get("title"),
+        "due_at": due.isoformat() if due else None,
+        "assignment_id": assignment.get("id"),
+        "quiz_id": (item.get("quiz") or {}).get("id"),
+        "context_code": item.get("context_code") or (f"course_{item['course_id']}" if item.get("course_id") else None),
+        "html_url": target.get("html_url") or item.get("html_url")
+    }
 
 def register_tools(mcp: FastMCP):
     # --- Announcements ---
     @mcp.tool()
+    @traced_tool
     async def list_announcements(
         context_codes: Optional[List[str]] = None,
         course_id: Optional[str] = None,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -39,21 +169,21 @@ def register_tools(mcp: FastMCP):
                 "/api/v1/announcements",
                 params=params,
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     # --- Discussions ---
     @mcp.tool()
+    @traced_tool
     async def list_discussion_topics(
         course_id: str,
         search_term: Optional[str] = None,
         include: Optional[List[str]] = None,
-        per_page: int = 50,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -68,22 +198,98 @@ def register_tools(mcp: FastMCP):
                 f"/api/v1/courses/{course_id}/discussion_topics",
                 params=params,
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    @mcp.tool()
+    @traced_tool
+    async def get_discussion_thread(
+        course_id: str,
+        topic_id: str,
+        max_depth: Optional[int] = None,
+        include_deleted: bool = False,
+        offset: int = 0,
+        max_items: Optional[int] = 50
+    ) -> str:
+        """
+        Get an entire discussion thread (all entries and replies) in a single request.
+
+        Uses the Canvas full-topic view, flattened into thread order with a depth
+        field per entry. Results are paginated locally: pass the returned
+        `next_offset` back as `offset` to read the next slice. If Canvas is still
+        building the view, the thread is read from the paged entries endpoints
+        instead (`source` is then "entries").
+
+        Args:
+            max_depth: Maximum reply depth to include (0 = top-level entries only).
+            include_deleted: Include placeholders for deleted entries.
+            offset: Index of the first flattened entry to return.
+            max_items: Max entries to return (None for all).
+        """
+        try:
+            source = "view"
+            data = None
+            for delay in (*VIEW_RETRY_DELAYS, None):
+                try:
+                    data = await client.request(
+                        f"/api/v1/courses/{course_id}/discussion_topics/{topic_id}/view",
+                        cache=True
+                    )
+                    break
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code == 403 and "require_initial_post" in e.response.text:
+                        return json.dumps({
+                            "error": "This discussion requires you to post before you can see other replies "
+                                     "(require_initial_post). Post an initial reply in Canvas, then try again."
+                        })
+                    if e.response.status_code != 503:
+                        raise
+                    if delay is None:
+                        # View still not built: read the thread page by page instead
+                        source = "entries"
+                        data = await _fetch_thread_entries(course_id, topic_id)
+                    else:
+                        await asyncio.sleep(delay)
+            if not isinstance(data, dict):
+                return json.dumps({"error": f"Unexpected discussion view response for topic {topic_id}"})
+
+            participants = {p.get("id"): p.get("display_name") for p in data.get("participants", [])}
+            # new_entries holds posts made after Canvas last materialized the view
+            entries = _attach_new_entries(data.get("view", []), data.get("new_entries") or [])
+            flat = list(_iter_thread_entries(entries, participants, max_depth, include_deleted))
+
+            start = max(offset, 0)
+            end = start + max_items if max_items else len(flat)
+            page = flat[start:end]
+            result = {
+                "topic_id": topic_id,
+                "source": source,
+                "total_entries": len(flat),
+                "offset": start,
+                "next_offset": end if end < len(flat) else None,
+                "unread_entries": data.get("unread_entries", []),
+                "entries": page
+            }
+            return json.dumps(result, indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     # --- Calendar ---
     @mcp.tool()
+    @traced_tool
     async def list_calendar_events(
         context_codes: Optional[List[str]] = None,
         type: Optional[str] = None,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        per_page: int = 50,
+        due_after: Optional[str] = None,
+        due_before: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
@@ -92,44 +298,190 @@ def register_tools(mcp: FastMCP):
         
         Args:
             type: 'event' or 'assignment'.
+            due_after: ISO8601; only events starting / due at or after this time.
+            due_before: ISO8601; only events starting / due at or before this time.
+            sort_by: Sort results by 'due_at', '-due_at' or 'title'.
         """
         params = {
             "context_codes": context_codes,
             "type": type,
+            # Canvas filters calendar events by date server-side; the exact bounds are re-checked locally
             "start_date": start_date,
             "end_date": end_date,
             "per_page": per_page
         }
+        if due_after or due_before:
+            params["start_date"] = start_date or due_after
+            params["end_date"] = end_date or due_before
+            # Canvas defaults a missing end_date to start_date and a missing
+            # start_date to today, so an open-ended window needs explicit wide bounds
+            if not params["start_date"]:
+                params["start_date"] = CALENDAR_MIN_DATE
+            if not params["end_date"]:
+                params["end_date"] = CALENDAR_MAX_DATE
         try:
+            if due_after or due_before or sort_by:
+                info = {}
+                data = await query_items(
+                    client.iter_pages("/api/v1/calendar_events", params=params, max_pages=max_pages, info=info),
+                    due_after=due_after,
+                    due_before=due_before,
+                    sort_by=sort_by,
+                    sorted_by_due=True,
+                    max_items=max_items,
+                    info=info
+                )
+                return json.dumps(paged_response(data, info), indent=2)
+
             data = await client.request(
                 "/api/v1/calendar_events",
                 params=params,
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     # --- Todo ---
     @mcp.tool()
+    @traced_tool
     async def list_todo(
-        per_page: int = 50,
+        due_after: Optional[str] = None,
+        due_before: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        per_page: Optional[int] = None,
         max_pages: int = 5,
         max_items: Optional[int] = None
     ) -> str:
-        """List the current user's to-do items."""
+        """
+        List the current user's to-do items.
+
+        Args:
+            due_after: ISO8601; only items due at or after this time.
+            due_before: ISO8601; only items due at or before this time.
+            sort_by: Sort results by 'due_at' or '-due_at'.
+        """
         try:
+            if due_after or due_before or sort_by:
+                info = {}
+                data = await query_items(
+                    client.iter_pages("/api/v1/users/self/todo", params={"per_page": per_page}, max_pages=max_pages, info=info),
+                    due_after=due_after,
+                    due_before=due_before,
+                    sort_by=sort_by,
+                    max_items=max_items,
+                    info=info
+                )
+                return json.dumps(paged_response(data, info), indent=2)
+
             data = await client.request(
                 "/api/v1/users/self/todo",
                 params={"per_page": per_page},
                 paginate=True,
-                max_pages=max_pages
+                max_pages=max_pages,
+                max_items=max_items
             )
-            if max_items and isinstance(data, list):
-                data = data[:max_items]
-            return json.dumps(data, indent=2)
+            return json.dumps(paged_response(data), indent=2)
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    # --- Deadlines ---
+    @mcp.tool()
+    @traced_tool
+    async def list_upcoming_deadlines(
+        course_ids: Optional[List[str]] = None,
+        days: int = 14,
+        include_events: bool = False,
+        max_pages: int = 5,
+        max_items: Optional[int] = 50
+    ) -> str:
+        """
+        List upcoming deadlines across to-do items and calendar assignments, soonest first.
+
+        Sources are fetched concurrently, each filtered to the window and sorted, then
+        merged in a single pass; an assignment reported by several sources appears once.
+        Sources that max_pages cut short are listed under "truncated_sources".
+
+        Args:
+            course_ids: Courses whose calendar assignments to include (to-do items always cover all courses).
+            days: Size of the window from now, in days.
+            include_events: Also include non-assignment calendar events.
+            max_items: Max deadlines to return.
+        """
+        now = datetime.now(timezone.utc)
+        due_after = now.isoformat()
+        due_before = (now + timedelta(days=days)).isoformat()
+        context_codes = [f"course_{c}" for c in course_ids] if course_ids else None
+
+        # Pagination info per source, to report which ones max_pages cut short
+        infos = {"todo": {}}
+        sources = {
+            "todo": client.iter_pages("/api/v1/users/self/todo", params={"per_page": 100}, max_pages=max_pages, info=infos["todo"])
+        }
+        if context_codes:
+            for event_type in (["assignment", "event"] if include_events else ["assignment"]):
+                name = f"calendar_{event_type}"
+                infos[name] = {}
+                sources[name] = client.iter_pages(
+                    "/api/v1/calendar_events",
+                    params={
+                        "context_codes": context_codes,
+                        "type": event_type,
+                        "start_date": due_after,
+                        "end_date": due_before,
+                        "per_page": 100
+                    },
+                    max_pages=max_pages,
+                    info=infos[name]
+                )
+
+        try:
+            fetched = await asyncio.gather(
+                *(
+                    query_items(
+                        pages, due_after=due_after, due_before=due_before, sort_by="due_at",
+                        max_items=max_items, info=infos[name]
+                    )
+                    for name, pages in sources.items()
+                ),
+                return_exceptions=True
+            )
+
+            streams = []
+            errors = {}
+            for name, items in zip(sources, fetched):
+                if isinstance(items, Exception):
+                    errors[name] = str(items)
+                else:
+                    streams.append([(due_sort_key(item), name, item) for item in items])
+            if errors and not streams:
+                return json.dumps({"error": errors})
+
+            deadlines = []
+            seen = set()
+            for _, name, item in heapq.merge(*streams, key=lambda entry: entry[0]):
+                entry = _deadline_entry(item, name)
+                if entry["assignment_id"] is not None:
+                    if entry["assignment_id"] in seen:
+                        continue
+                    seen.add(entry["assignment_id"])
+                deadlines.append(entry)
+                if max_items and len(deadlines) >= max_items:
+                    break
+
+            result = {"window": {"due_after": due_after, "due_before": due_before}, "deadlines": deadlines}
+            truncated_sources = {
+                name: info.get("next_url") for name, info in infos.items()
+                if name not in errors and info.get("truncated")
+            }
+            if truncated_sources:
+                result["truncated"] = True
+                result["truncated_sources"] = truncated_sources
+                result["note"] = "Some sources had more pages in the window; increase max_pages or shorten days."
+            if errors:
+                result["errors"] = errors
+            return json.dumps(result, indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
@@ -0,0 +1,153 @@
+import atexit
+import functools
+import inspect
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+from .config import Config
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+except ImportError:  # Tracing is optional: pip install opentelemetry-sdk
+    trace = None
+
+class TimingStats:
+    """Per-tool-call counters and phase timings, collected when debug_timing is set."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.pages = 0
+        self.bytes = 0
+        self.cache_hits = 0
+        self.phases_ms: Dict[str, float] = {}
+
+    def add_phase(self, phase: str, elapsed_ms: float):
+        self.phases_ms[phase] = self.phases_ms.get(phase, 0.0) + elapsed_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return {
+            "total_ms": round(total_ms, 1),
+            "requests": self.requests,
+            "pages": self.pages,
+            "bytes": self.bytes,
+            "cache_hits": self.cache_hits,
+            # Phases overlap when work runs concurrently, so they may sum past total_ms
+            "phases_ms": {name: round(ms, 1) for name, ms in self.phases_ms.items()}
+        }
+
+_current_timing: ContextVar[Optional[TimingStats]] = ContextVar("canvas_mcp_timing", default=None)
+
+def current_timing() -> Optional[TimingStats]:
+    """The TimingStats for the running tool call, or None when debug_timing is off."""
+    return _current_timing.get()
+
+def _create_tracer():
+    exporter_name = (Config.TRACE_EXPORTER or "").lower()
+    if not exporter_name:
+        return None
+    if trace is None:
+        print(f"WARNING: TRACE_EXPORTER={exporter_name} but opentelemetry-sdk is not installed; tracing disabled.")
+        return None
+
+    if exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(Config.TRACE_FILE, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    else:
+        print(f"WARNING: Unknown TRACE_EXPORTER '{exporter_name}' (use console or file); tracing disabled.")
+        return None
+
+    provider = TracerProvider()
+    # Export from a background thread so tool calls never wait on the exporter;
+    # shutdown flushes spans still queued when the server exits
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    atexit.register(provider.shutdown)
+    return provider.get_tracer("canvas-mcp")
+
+_tracer = None
+_tracer_ready = False
+
+def _get_tracer():
+    # Created on first use so importing this module (e.g. in parse-pool workers)
+    # does not open exporters or trace files
+    global _tracer, _tracer_ready
+    if not _tracer_ready:
+        _tracer = _create_tracer()
+        _tracer_ready = True
+    return _tracer
+
+@contextmanager
+def span(name: str, phase: Optional[str] = None, **attributes) -> Iterator[Any]:
+    """
+    Time a block of work.
+
+    Emits an OpenTelemetry span when a trace exporter is configured, and adds the
+    elapsed time to `phase` in the current TimingStats when debug_timing is on.
+    Yields the OTel span (or None) so callers can attach attributes.
+    """
+    start = time.perf_counter()
+    tracer = _get_tracer()
+    try:
+        if tracer is not None:
+            with tracer.start_as_current_span(
+                name, attributes={k: v for k, v in attributes.items() if v is not None}
+            ) as otel_span:
+                yield otel_span
+        else:
+            yield None
+    finally:
+        stats = _current_timing.get()
+        if stats is not None and phase:
+            stats.add_phase(phase, (time.perf_counter() - start) * 1000)
+
+def traced_tool(func):
+    """
+    Wrap a tool function in a span and give it a `debug_timing` flag.
+
+    With debug_timing=True, a timing breakdown is added to the JSON response under
+    "timing" (list responses are wrapped as {"data": [...], "timing": {...}}). Its
+    "serialize" phase is the cost of encoding the response payload as JSON.
+    """
+    signature = inspect.signature(func)
+    debug_param = inspect.Parameter(
+        "debug_timing", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool
+    )
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        debug_timing = kwargs.pop("debug_timing", False)
+        stats = TimingStats() if debug_timing else None
+        token = _current_timing.set(stats)
+        try:
+            with span(f"tool.{func.__name__}", tool=func.__name__):
+                result = await func(*args, **kwargs)
+            if stats is None:
+                return result
+            try:
+                data = json.loads(result)
+            except (TypeError, ValueError):
+                return result
+            if not isinstance(data, dict):
+                data = {"data": data}
+            # Tools encode their own responses, so time an encode of the same payload
+            # here; it runs only when debug_timing is on
+            with span("serialize", phase="serialize"):
+                json.dumps(data, indent=2)
+        finally:
+            _current_timing.reset(token)
+
+        data["timing"] = stats.to_dict()
+        return json.dumps(data, indent=2)
+
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), debug_param])
+    wrapper.__annotations__ = {**func.__annotations__, "debug_timing": bool}
+    return wrapper
@@ -1,5 +1,17 @@
+import asyncio
+import codecs
 import io
+import multiprocessing
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from pypdf import PdfReader
+from .tracing import span
 
 def extract_pdf_text(buffer: bytes, max_chars: int = 0) -> str:
     """
@@ -14,11 +26,17 @@ def extract_pdf_text(buffer: bytes, max_chars: int = 0) -> str:
     """
     try:
         reader = PdfReader(io.BytesIO(buffer))
-        text = ""
+        parts = []
+        length = 0
         for page in reader.pages:
-            text += page.extract_text() + "\n"
+            page_text = page.extract_text() + "\n"
+            parts.append(page_text)
+            length += len(page_text)
+            # Stop parsing pages once the budget is covered
+            if max_chars > 0 and length > max_chars:
+                break
             
-        text = text.strip()
+        text = "".join(parts).strip()
         
         if max_chars > 0 and len(text) > max_chars:
             text = text[:max_chars]
@@ -26,3 +44,509 @@ def extract_pdf_text(buffer: bytes, max_chars: int = 0) -> str:
         return text
     except Exception as e:
         raise ValueError(f"Failed to parse PDF: {str(e)}")
+
+def _truncate(text: str, max_chars: int) -> str:
+    if max_chars > 0 and len(text) > max_chars:
+        return text[:max_chars]
+    return text
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _ooxml_part_text(archive: zipfile.ZipFile, part: str, text_tag: str, block_tags: Tuple[str, ...], budget: int) -> str:
+    """
+    Stream one XML part, joining text elements and breaking lines at block elements.
+
+    Run-level tabs (w:tab) become tabs and line breaks (w:br, w:cr, a:br) become
+    newlines. Tab elements outside a run are tab-stop definitions and are ignored.
+    """
+    chunks = []
+    length = 0
+    path: List[str] = []
+    with archive.open(part) as stream:
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            name = _local_name(elem.tag)
+            if event == "start":
+                path.append(name)
+                continue
+            path.pop()
+            if name == text_tag and elem.text:
+                chunks.append(elem.text)
+                length += len(elem.text)
+            elif name == "tab" and path and path[-1] == "r":
+                chunks.append("\t")
+                length += 1
+            elif name in ("br", "cr"):
+                chunks.append("\n")
+                length += 1
+            elif name in block_tags:
+                chunks.append("\n")
+                length += 1
+                # Drop finished blocks so memory stays flat on large documents
+                elem.clear()
+            if budget > 0 and length > budget:
+                break
+    return "".join(chunks)
+
+def _part_number(name: str) -> int:
+    match = re.search(r"(\d+)\.xml$", name)
+    return int(match.group(1)) if match else 0
+
+def extract_docx_text(buffer: bytes, max_chars: int = 0) -> str:
+    """Extract paragraph text from a Word (.docx) document."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(buffer)) as archive:
+            text = _ooxml_part_text(archive, "word/document.xml", "t", ("p",), max_chars)
+        return _truncate(text.strip(), max_chars)
+    except Exception as e:
+        raise ValueError(f"Failed to parse DOCX: {str(e)}")
+
+def extract_pptx_text(buffer: bytes, max_chars: int = 0) -> str:
+    """Extract slide text from a PowerPoint (.pptx) presentation, in slide order."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(buffer)) as archive:
+            slides = sorted(
+                (n for n in archive.namelist() if re.match(r"ppt/slides/slide\d+\.xml$", n)),
+                key=_part_number
+            )
+            parts = []
+            length = 0
+            for slide in slides:
+                remaining = max_chars - length if max_chars > 0 else 0
+                slide_text = _ooxml_part_text(archive, slide, "t", ("p",), remaining).strip()
+                parts.append(f"--- Slide {_part_number(slide)} ---\n{slide_text}\n")
+                length += len(parts[-1])
+                if max_chars > 0 and length > max_chars:
+                    break
+        return _truncate("".join(parts).strip(), max_chars)
+    except Exception as e:
+        raise ValueError(f"Failed to parse PPTX: {str(e)}")
+
+# Built-in number formats that display dates/times
+_XLSX_DATE_FORMAT_IDS = set(range(14, 23)) | {45, 46, 47}
+
+def _xlsx_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as stream:
+        for event, elem in ET.iterparse(stream, events=("end",)):
+            if _local_name(elem.tag) == "si":
+                # Rich text splits one string over several <t> runs
+                strings.append("".join(t.text or "" for t in elem.iter() if _local_name(t.tag) == "t"))
+                elem.clear()
+    return strings
+
+def _xlsx_date_styles(archive: zipfile.ZipFile) -> set:
+    """Indexes of cell styles (the c/@s attribute) whose number format is a date."""
+    if "xl/styles.xml" not in archive.namelist():
+        return set()
+    root = ET.fromstring(archive.read("xl/styles.xml"))
+    date_formats = set(_XLSX_DATE_FORMAT_IDS)
+    for elem in root.iter():
+        if _local_name(elem.tag) == "numFmt":
+            # Strip quoted literals and [colour]/[locale] tags before looking for date tokens
+            code = re.sub(r'"[^"]*"|\[[^\]]*\]', "", elem.get("formatCode", "")).lower()
+            if re.search(r"[dmyhs]", code):
+                date_formats.add(int(elem.get("numFmtId", "-1")))
+    date_styles = set()
+    for elem in root.iter():
+        if _local_name(elem.tag) == "cellXfs":
+            for index, xf in enumerate(x for x in elem if _local_name(x.tag) == "xf"):
+                if int(xf.get("numFmtId", "0")) in date_formats:
+                    date_styles.add(index)
+    return date_styles
+
+def _xlsx_sheets(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """(sheet name, part path) pairs in workbook order."""
+    names = archive.namelist()
+    try:
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {r.get("Id"): r.get("Target", "") for r in rels}
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        sheets = []
+        for elem in workbook.iter():
+            if _local_name(elem.tag) != "sheet":
+                continue
+            rel_id = next((v for k, v in elem.attrib.items() if _local_name(k) == "id"), None)
+            target = targets.get(rel_id, "")
+            part = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+            if part in names:
+                sheets.append((elem.get("name", part), part))
+        if sheets:
+            return sheets
+    except KeyError:
+        pass
+    parts = sorted((n for n in names if re.match(r"xl/worksheets/sheet\d+\.xml$", n)), key=_part_number)
+    return [(f"Sheet{_part_number(p)}", p) for p in parts]
+
+def _xlsx_column(ref: Optional[str]) -> Optional[int]:
+    match = re.match(r"([A-Z]+)", ref or "")
+    if not match:
+        return None
+    column = 0
+    for char in match.group(1):
+        column = column * 26 + ord(char) - ord("A") + 1
+    return column - 1
+
+def _xlsx_cell_value(cell: ET.Element, shared: List[str], date_styles: set) -> str:
+    cell_type = cell.get("t", "n")
+    value = None
+    inline = []
+    for child in cell.iter():
+        name = _local_name(child.tag)
+        if name == "v":
+            value = child.text
+        elif name == "t" and cell_type == "inlineStr":
+            inline.append(child.text or "")
+    if cell_type == "inlineStr":
+        return "".join(inline)
+    if value is None:
+        return ""
+    if cell_type == "s":
+        index = int(value)
+        return shared[index] if index < len(shared) else ""
+    if cell_type == "b":
+        return "TRUE" if value == "1" else "FALSE"
+    if cell_type == "n" and int(cell.get("s", "0")) in date_styles:
+        try:
+            # Excel serial dates count days from 1899-12-30 (1900 date system)
+            moment = datetime(1899, 12, 30) + timedelta(days=float(value))
+            return moment.date().isoformat() if moment.time() == datetime.min.time() else moment.isoformat(sep=" ")
+        except (ValueError, OverflowError):
+            return value
+    # Numbers, and cached results of formulas (t="str", "e" or numeric)
+    return value
+
+def extract_xlsx_text(buffer: bytes, max_chars: int = 0) -> str:
+    """
+    Extract cell values from an Excel (.xlsx) workbook, sheet by sheet and row by row.
+
+    Cells are joined with tabs (keeping column positions) and rows with newlines.
+    Shared and inline strings, numbers, booleans, dates and cached formula results
+    are included.
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(buffer)) as archive:
+            shared = _xlsx_shared_strings(archive)
+            date_styles = _xlsx_date_styles(archive)
+            parts = []
+            length = 0
+            for sheet_name, part in _xlsx_sheets(archive):
+                parts.append(f"--- Sheet: {sheet_name} ---\n")
+                with archive.open(part) as stream:
+                    for event, elem in ET.iterparse(stream, events=("end",)):
+                        if _local_name(elem.tag) != "row":
+                            continue
+                        cells: List[str] = []
+                        for cell in (c for c in elem if _local_name(c.tag) == "c"):
+                            column = _xlsx_column(cell.get("r"))
+                            if column is not None and column > len(cells):
+                                cells.extend([""] * (column - len(cells)))
+                            cells.append(_xlsx_cell_value(cell, shared, date_styles))
+                        elem.clear()
+                        line = "\t".join(cells).rstrip("\t")
+                        if line:
+                            parts.append(line + "\n")
+                            length += len(line) + 1
+                        if max_chars > 0 and length > max_chars:
+                            break
+                if max_chars > 0 and length > max_chars:
+                    break
+        return _truncate("".join(parts).strip(), max_chars)
+    except Exception as e:
+        raise ValueError(f"Failed to parse XLSX: {str(e)}")
+
+def decode_text(buffer: bytes) -> str:
+    """
+    Decode a text file, sniffing the encoding.
+
+    Honours a UTF-8/UTF-16 BOM, then tries strict UTF-8 and falls back to
+    cp1252 (common for CSV exports), then latin-1 which never fails.
+    """
+    for bom, encoding in (
+        (codecs.BOM_UTF8, "utf-8-sig"),
+        (codecs.BOM_UTF16_LE, "utf-16"),
+        (codecs.BOM_UTF16_BE, "utf-16"),
+    ):
+        if buffer.startswith(bom):
+            return buffer.decode(encoding, errors="replace")
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            return buffer.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return buffer.decode("latin-1")
+
+def extract_plain_text(buffer: bytes, max_chars: int = 0) -> str:
+    """Extract text from plain text, CSV, Markdown or similar files."""
+    return _truncate(decode_text(buffer).strip(), max_chars)
+
+# Extractor registry: lookups go by mime type first, then by file extension
+EXTRACTORS_BY_MIME: Dict[str, Callable[[bytes, int], str]] = {}
+EXTRACTORS_BY_EXTENSION: Dict[str, Callable[[bytes, int], str]] = {}
+
+def register_extractor(func: Callable[[bytes, int], str], mime_types: List[str], extensions: List[str]):
+    """
+    Register a text extractor for the given mime types and file extensions.
+
+    Extractors take (buffer, max_chars) and must be module-level functions so
+    they can run on the parse process pool.
+    """
+    for mime in mime_types:
+        EXTRACTORS_BY_MIME[mime.lower()] = func
+    for ext in extensions:
+        EXTRACTORS_BY_EXTENSION[ext.lower().lstrip(".")] = func
+
+def find_extractor(mime_type: Optional[str], filename: Optional[str]) -> Optional[Callable[[bytes, int], str]]:
+    """Find the extractor for a file, or None if the format is not supported."""
+    mime = (mime_type or "").split(";")[0].strip().lower()
+    if mime in EXTRACTORS_BY_MIME:
+        return EXTRACTORS_BY_MIME[mime]
+    if mime.startswith("text/"):
+        return extract_plain_text
+    name = (filename or "").lower()
+    if "." in name:
+        return EXTRACTORS_BY_EXTENSION.get(name.rsplit(".", 1)[-1])
+    return None
+
+register_extractor(extract_pdf_text, ["application/pdf"], ["pdf"])
+register_extractor(
+    extract_docx_text,
+    ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+    ["docx"]
+)
+register_extractor(
+    extract_pptx_text,
+    ["application/vnd.openxmlformats-officedocument.presentationml.presentation"],
+    ["pptx"]
+)
+register_extractor(
+    extract_xlsx_text,
+    ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"],
+    ["xlsx"]
+)
+register_extractor(
+    extract_plain_text,
+    ["text/plain", "text/csv", "text/markdown", "application/json", "application/csv"],
+    ["txt", "csv", "tsv", "md", "json", "py", "java", "c", "cpp"]
+)
+
+_parse_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_parse_executor(rebuild: bool = False) -> ProcessPoolExecutor:
+    global _parse_executor
+    if rebuild and _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+    if _parse_executor is None:
+        # spawn, not fork: the server already runs threads (to_thread, tracing exporters)
+        _parse_executor = ProcessPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_executor
+
+async def run_in_parse_pool(func, *args):
+    """
+    Run a CPU-bound parser (e.g. extract_pdf_text) on a shared worker process pool.
+
+    Keeps parsing off the event loop and lets several documents parse in parallel;
+    the pool is created on first use. If a worker dies (e.g. out of memory on a
+    large file) the pool is rebuilt and the call retried once.
+    """
+    loop = asyncio.get_running_loop()
+    with span("parse", phase="parse", parser=func.__name__):
+        executor = _get_parse_executor()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # Another call may already have replaced the broken pool
+            executor = _get_parse_executor(rebuild=_parse_executor is executor)
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # Leave a working pool behind for later calls, then report the failure
+                _get_parse_executor(rebuild=_parse_executor is executor)
+                raise ValueError(f"Parser worker crashed while running {func.__name__}")
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an ISO8601 timestamp (as returned by Canvas) into an aware datetime.
+
+    Date-only values are treated as midnight UTC. Returns None for empty input.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid ISO8601 date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def item_due_date(item: Dict[str, Any]) -> Optional[datetime]:
+    """
+    Get the effective due date of an assignment, calendar event or to-do item.
+
+    Checks due_at, then a nested assignment/quiz due_at (to-do items and
+    assignment calendar events), then start_at for plain calendar events.
+    """
+    for value in (
+        item.get("due_at"),
+        (item.get("assignment") or {}).get("due_at"),
+        (item.get("quiz") or {}).get("due_at"),
+        item.get("start_at"),
+    ):
+        if value:
+            return parse_datetime(value)
+    return None
+
+def due_sort_key(item: Dict[str, Any]) -> Tuple[int, datetime]:
+    """Sort key ordering items by due date ascending, undated items last."""
+    due = item_due_date(item)
+    if due is None:
+        return (1, datetime.max.replace(tzinfo=timezone.utc))
+    return (0, due)
+
+def sort_items(items: List[Dict[str, Any]], sort_by: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Sort items locally.
+
+    Args:
+        sort_by: 'due_at' (soonest first, undated last), '-due_at' (latest first,
+            undated last), 'name' / 'title', or None to keep the Canvas order.
+    """
+    if not sort_by:
+        return items
+    if sort_by == "due_at":
+        return sorted(items, key=due_sort_key)
+    if sort_by == "-due_at":
+        dated = [i for i in items if item_due_date(i) is not None]
+        undated = [i for i in items if item_due_date(i) is None]
+        return sorted(dated, key=item_due_date, reverse=True) + undated
+    if sort_by in ("name", "title"):
+        return sorted(items, key=lambda i: (i.get("name") or i.get("title") or "").lower())
+    raise ValueError(f"Unsupported sort_by: {sort_by} (use due_at, -due_at, name or title)")
+
+async def collect_in_window(
+    pages: AsyncIterator[Union[Dict, List]],
+    due_after: Optional[str] = None,
+    due_before: Optional[str] = None,
+    sorted_by_due: bool = False,
+    max_items: Optional[int] = None,
+    info: Optional[Dict] = None
+) -> List[Dict[str, Any]]:
+    """
+    Consume a page stream keeping only items whose due date is in [due_after, due_before].
+
+    When the stream is known to be sorted by due date ascending (sorted_by_due),
+    iteration stops once a whole page lies past due_before, so later pages are
+    never fetched. The check is per page rather than per item because Canvas
+    sorts assignments by their base due date while due_at reflects the user's
+    overrides, so single items can be out of order. With max_items set,
+    iteration also stops once enough items matched.
+    Undated items are dropped whenever a window is given.
+
+    Stopping early means nothing the caller asked for is missing, so the
+    pagination info (as filled by iter_pages) is then marked not truncated.
+
+    Args:
+        pages: Async iterator of pages, e.g. from CanvasClient.iter_pages.
+        due_after: ISO8601 lower bound (inclusive).
+        due_before: ISO8601 upper bound (inclusive).
+        sorted_by_due: Whether the stream is ordered by due date ascending.
+        max_items: Stop after this many matching items.
+        info: The pagination info dict passed to iter_pages, if any.
+    """
+    after = parse_datetime(due_after)
+    before = parse_datetime(due_before)
+    windowed = after is not None or before is not None
+    results = []
+
+    async for page in pages:
+        if not isinstance(page, list):
+            raise ValueError(f"Expected a list response, got: {str(page)[:200]}")
+        # Undated items do not count either way; the page needs dated items, all past the window
+        dated_past = dated_within = False
+        for item in page:
+            due = item_due_date(item)
+            if due is not None and before is not None:
+                if due > before:
+                    dated_past = True
+                else:
+                    dated_within = True
+            if windowed:
+                if due is None:
+                    continue
+                if before is not None and due > before:
+                    continue
+                if after is not None and due < after:
+                    continue
+            results.append(item)
+            if max_items and len(results) >= max_items:
+                return _stopped_early(results, info)
+        if sorted_by_due and dated_past and not dated_within:
+            return _stopped_early(results, info)
+    return results
+
+def _stopped_early(results: List[Dict[str, Any]], info: Optional[Dict]) -> List[Dict[str, Any]]:
+    if info is not None:
+        info.update({"truncated": False, "next_url": None})
+    return results
+
+def paged_response(data: Any, info: Optional[Dict] = None) -> Any:
+    """
+    Prepare a paginated listing for a tool response.
+
+    Complete listings are returned unchanged. When max_pages cut the listing short
+    (see CanvasClient.iter_pages), the items are wrapped with an explicit
+    truncation notice instead of being returned as if complete. `info` defaults
+    to the pagination info of a PagedList; pass the iter_pages info dict for
+    listings built from a page stream.
+    """
+    if info is None:
+        info = getattr(data, "info", None) or {}
+    if info.get("truncated"):
+        return {
+            "items": list(data),
+            "truncated": True,
+            "next_page": info.get("next_url"),
+            "note": "More results are available; increase max_pages or max_items, or narrow the query."
+        }
+    return data
+
+async def query_items(
+    pages: AsyncIterator[Union[Dict, List]],
+    due_after: Optional[str] = None,
+    due_before: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sorted_by_due: bool = False,
+    max_items: Optional[int] = None,
+    info: Optional[Dict] = None
+) -> List[Dict[str, Any]]:
+    """
+    Apply due-date window, sorting and max_items to a page stream.
+
+    max_items is pushed into the stream (stopping pagination early) only when no
+    local sort is requested; otherwise everything in the window is collected,
+    sorted locally and then truncated. Pass the iter_pages info dict as `info`
+    to have it reflect whether max_pages cut the window short.
+    """
+    sort_items([], sort_by)  # validate before making any requests
+    # Canvas due-date order is not exact (see collect_in_window), so only unsorted
+    # requests can stop at max_items before everything in the window is collected
+    stream_ordered = not sort_by
+    items = await collect_in_window(
+        pages,
+        due_after=due_after,
+        due_before=due_before,
+        sorted_by_due=sorted_by_due,
+        max_items=max_items if stream_ordered else None,
+        info=info
+    )
+    items = sort_items(items, sort_by)
+    if max_items:
+        items = items[:max_items]
+    return items